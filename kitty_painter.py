@@ -5,6 +5,7 @@ This script uses the Kitty Graphics Protocol to maintain a simple RGBA canvas
 and lets the user paint with the mouse directly inside the terminal window.
 """
 import base64
+import math
 import os
 import re
 import select
@@ -13,16 +14,21 @@ import termios
 import time
 import tty
 from dataclasses import dataclass, field
-from typing import List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 ESC = "\x1b"
 CHUNK = 4096
-MOUSE_RE = re.compile(r"^\x1b\[<(\d+);(\d+);(\d+)([mM])")
-CSI_RE = re.compile(r"^\x1b\[([0-9;?]*)([@-~])")
+RAW_CHUNK = CHUNK // 4 * 3
+FRAME_INTERVAL = 1 / 60
+CSI_RE = re.compile(rb"\x1b\[([0-9;?]*)([@-~])")
+WINDOW_CELLS_RE = re.compile(r"\x1b\[8;(\d+);(\d+)t")
+WINDOW_PIXELS_RE = re.compile(r"\x1b\[4;(\d+);(\d+)t")
 
 
 Attr = List[Union[int, List[Union[int, bytes]]]]
 
+_SPAN_CACHE: Dict[int, Tuple[int, ...]] = {}
+
 
 class RawTerminal:
     """Context manager that switches stdin into raw mode."""
@@ -41,22 +47,25 @@ class RawTerminal:
             termios.tcsetattr(self.fd, termios.TCSADRAIN, self.old_attrs)
 
 
-def kitty_send(payload: bytes, control: str) -> None:
-    """Send RGBA payload to Kitty using the provided control parameters."""
-    data = base64.b64encode(payload).decode("ascii")
-    first = True
-    idx = 0
-    length = len(data)
-    while idx < length:
-        chunk = data[idx : idx + CHUNK]
-        idx += len(chunk)
-        more = 1 if idx < length else 0
-        if first:
-            sys.stdout.write(f"{ESC}_G{control},m={more};{chunk}{ESC}\\")
-            first = False
-        else:
-            sys.stdout.write(f"{ESC}_Gm={more};{chunk}{ESC}\\")
-    sys.stdout.flush()
+def kitty_send(payload: Union[bytes, memoryview], control: str, out: Optional[bytearray] = None) -> None:
+    """Send RGBA payload to Kitty using the provided control parameters.
+
+    When ``out`` is given the escape sequences are appended to it instead of
+    being written and flushed immediately.
+    """
+    raw = memoryview(payload)
+    length = len(raw)
+    write = out.extend if out is not None else sys.stdout.buffer.write
+    header = f"{ESC}_G{control},m=".encode("ascii")
+    for off in range(0, length, RAW_CHUNK):
+        end = off + RAW_CHUNK
+        write(header)
+        write(b"1;" if end < length else b"0;")
+        write(base64.b64encode(raw[off:end]))
+        write(b"\x1b\\")
+        header = b"\x1b_Gm="
+    if out is None:
+        sys.stdout.flush()
 
 
 def kitty_delete(image_id: int, placement_id: Optional[int] = None, delete_data: bool = False) -> None:
@@ -64,66 +73,99 @@ def kitty_delete(image_id: int, placement_id: Optional[int] = None, delete_data:
     parts = ["a=d", f"d={delete_key}", f"i={image_id}"]
     if placement_id is not None:
         parts.append(f"p={placement_id}")
-    sys.stdout.write(f"{ESC}_G{','.join(parts)}{ESC}\\")
+    sys.stdout.buffer.write(f"{ESC}_G{','.join(parts)}{ESC}\\".encode("ascii"))
     sys.stdout.flush()
 
 
 def enable_mouse() -> None:
-    sys.stdout.write("\x1b[?1003h\x1b[?1006h")
+    sys.stdout.buffer.write(b"\x1b[?1003h\x1b[?1006h")
     sys.stdout.flush()
 
 
 def disable_mouse() -> None:
-    sys.stdout.write("\x1b[?1003l\x1b[?1006l")
+    sys.stdout.buffer.write(b"\x1b[?1003l\x1b[?1006l")
     sys.stdout.flush()
 
 
 def hide_cursor() -> None:
-    sys.stdout.write("\x1b[?25l")
+    sys.stdout.buffer.write(b"\x1b[?25l")
     sys.stdout.flush()
 
 
 def show_cursor() -> None:
-    sys.stdout.write("\x1b[?25h")
+    sys.stdout.buffer.write(b"\x1b[?25h")
     sys.stdout.flush()
 
 
 def clear_screen() -> None:
-    sys.stdout.write("\x1b[2J\x1b[H")
+    sys.stdout.buffer.write(b"\x1b[2J\x1b[H")
     sys.stdout.flush()
 
 
+def parse_mouse(buf: bytearray, i: int) -> Tuple[Optional[Tuple[int, int, int, str]], int]:
+    """Parse an SGR mouse report (ESC [ < b ; x ; y M/m) starting at ``buf[i]``.
+
+    Returns the event and the offset just past it, or ``(None, i)`` if the
+    report is incomplete or malformed.
+    """
+    pos = i + 3
+    end = len(buf)
+    fields = [0, 0, 0]
+    for n in range(3):
+        start = pos
+        value = 0
+        while pos < end:
+            c = buf[pos]
+            if c < 0x30 or c > 0x39:
+                break
+            value = value * 10 + c - 0x30
+            pos += 1
+        if pos == start or pos == end:
+            return None, i
+        sep = buf[pos]
+        if n < 2:
+            if sep != 0x3B:
+                return None, i
+        elif sep != 0x4D and sep != 0x6D:
+            return None, i
+        fields[n] = value
+        pos += 1
+    return (fields[0], fields[1], fields[2], chr(buf[pos - 1])), pos
+
+
 class EventParser:
     """Incremental parser for raw terminal input."""
 
     def __init__(self) -> None:
-        self.buffer = ""
+        self.buffer = bytearray()
 
     def feed(self, data: str) -> List[Tuple[str, Tuple]]:
-        self.buffer += data
+        buf = self.buffer
+        buf.extend(data.encode("latin-1"))
         events: List[Tuple[str, Tuple]] = []
-        while self.buffer:
-            head = self.buffer[0]
-            if head == "\x1b":
-                if self.buffer.startswith("\x1b[<"):
-                    match = MOUSE_RE.match(self.buffer)
-                    if match is None:
+        i = 0
+        end = len(buf)
+        while i < end:
+            head = buf[i]
+            if head == 0x1B:
+                if buf.startswith(b"\x1b[<", i):
+                    mouse, i_next = parse_mouse(buf, i)
+                    if mouse is None:
                         break
-                    b, x, y, kind = match.groups()
-                    self.buffer = self.buffer[match.end() :]
-                    events.append(("mouse", (int(b), int(x), int(y), kind)))
+                    i = i_next
+                    events.append(("mouse", mouse))
                     continue
-                csi_match = CSI_RE.match(self.buffer)
+                csi_match = CSI_RE.match(buf, i)
                 if csi_match is None:
                     break
-                seq = csi_match.group(0)
-                self.buffer = self.buffer[len(seq) :]
-                events.append(("csi", (seq,)))
+                i = csi_match.end()
+                events.append(("csi", (csi_match.group(0).decode("latin-1"),)))
                 continue
             else:
-                self.buffer = self.buffer[1:]
-                events.append(("char", (head,)))
+                i += 1
+                events.append(("char", (chr(head),)))
                 continue
+        del buf[:i]
         return events
 
 
@@ -145,64 +187,114 @@ class CanvasConfig:
     )
 
 
+def _disc_spans(radius: int) -> Tuple[int, ...]:
+    """Half-width of each row of a disc, from ``dy = -radius`` to ``dy = radius``."""
+    spans = _SPAN_CACHE.get(radius)
+    if spans is None:
+        r2 = radius * radius
+        spans = tuple(math.isqrt(r2 - dy * dy) for dy in range(-radius, radius + 1))
+        _SPAN_CACHE[radius] = spans
+    return spans
+
+
 class RGBAFramebuffer:
     def __init__(self, config: CanvasConfig) -> None:
         self.config = config
         self.width = config.width
         self.height = config.height
         self.data = bytearray(self.width * self.height * 4)
+        self.view = memoryview(self.data)
+        self.dirty: Optional[Tuple[int, int, int, int]] = None
         self.clear()
 
     def clear(self) -> None:
-        fill = bytes(self.config.background)
-        self.data[:] = fill * (self.width * self.height)
+        self.dirty = (0, 0, self.width, self.height)
+        view = self.view
+        size = len(view)
+        if not size:
+            return
+        view[:4] = bytes(self.config.background)
+        filled = 4
+        while filled < size:
+            n = min(filled, size - filled)
+            view[filled : filled + n] = view[:n]
+            filled += n
 
     def paint_disc(self, cx: int, cy: int, radius: int, color: Tuple[int, int, int, int]) -> None:
-        r2 = radius * radius
-        x0 = max(cx - radius, 0)
-        x1 = min(cx + radius, self.width - 1)
-        y0 = max(cy - radius, 0)
-        y1 = min(cy + radius, self.height - 1)
-        cr = color[0]
-        cg = color[1]
-        cb = color[2]
-        ca = color[3]
-        buf = self.data
-        w = self.width
-        for y in range(y0, y1 + 1):
-            dy = y - cy
-            dy2 = dy * dy
-            row_base = y * w * 4
-            for x in range(x0, x1 + 1):
-                dx = x - cx
-                if dx * dx + dy2 > r2:
-                    continue
-                idx = row_base + x * 4
-                buf[idx] = cr
-                buf[idx + 1] = cg
-                buf[idx + 2] = cb
-                buf[idx + 3] = ca
+        self._mark_dirty(cx - radius, cy - radius, cx + radius + 1, cy + radius + 1)
+        self._stamp_disc(cx, cy, radius, bytes(color))
 
     def paint_line(self, x0: int, y0: int, x1: int, y1: int, radius: int, color: Tuple[int, int, int, int]) -> None:
+        self._mark_dirty(
+            min(x0, x1) - radius,
+            min(y0, y1) - radius,
+            max(x0, x1) + radius + 1,
+            max(y0, y1) + radius + 1,
+        )
+        pixel = bytes(color)
         dx = x1 - x0
         dy = y1 - y0
         steps = max(abs(dx), abs(dy))
         if steps == 0:
-            self.paint_disc(x0, y0, radius, color)
+            self._stamp_disc(x0, y0, radius, pixel)
             return
+        stamp = self._stamp_disc
         for i in range(steps + 1):
             t = i / steps
-            x = int(round(x0 + t * dx))
-            y = int(round(y0 + t * dy))
-            self.paint_disc(x, y, radius, color)
+            stamp(int(round(x0 + t * dx)), int(round(y0 + t * dy)), radius, pixel)
+
+    def take_dirty(self) -> Optional[Tuple[int, int, int, int]]:
+        """Return the ``(x0, y0, x1, y1)`` rectangle changed since the last call and reset it."""
+        dirty = self.dirty
+        self.dirty = None
+        return dirty
+
+    def region(self, x0: int, y0: int, x1: int, y1: int) -> Union[bytes, memoryview]:
+        w = self.width
+        if x0 == 0 and x1 == w:
+            return self.view[y0 * w * 4 : y1 * w * 4]
+        view = self.view
+        return b"".join(view[(y * w + x0) * 4 : (y * w + x1) * 4] for y in range(y0, y1))
+
+    def _mark_dirty(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        x0 = max(x0, 0)
+        y0 = max(y0, 0)
+        x1 = min(x1, self.width)
+        y1 = min(y1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        if self.dirty is not None:
+            dx0, dy0, dx1, dy1 = self.dirty
+            x0 = min(x0, dx0)
+            y0 = min(y0, dy0)
+            x1 = max(x1, dx1)
+            y1 = max(y1, dy1)
+        self.dirty = (x0, y0, x1, y1)
+
+    def _stamp_disc(self, cx: int, cy: int, radius: int, pixel: bytes) -> None:
+        spans = _disc_spans(radius)
+        top = cy - radius
+        y0 = max(top, 0)
+        y1 = min(cy + radius, self.height - 1)
+        buf = self.data
+        w = self.width
+        for y in range(y0, y1 + 1):
+            half = spans[y - top]
+            x0 = max(cx - half, 0)
+            x1 = min(cx + half, w - 1)
+            if x0 > x1:
+                continue
+            row_base = y * w
+            buf[(row_base + x0) * 4 : (row_base + x1 + 1) * 4] = pixel * (x1 - x0 + 1)
 
 
 class KittyPainter:
     def __init__(self, config: CanvasConfig) -> None:
         self.config = config
         self.buffer = RGBAFramebuffer(config)
-        self.image_ids = (4242, 4243)
-        self.active_image_index = -1
+        self.image_id = 4242
+        self.image_placed = False
+        self._out = bytearray()
         self.placement_id = 1
         self.rows = 24
         self.cols = 80
@@ -239,8 +331,12 @@ class KittyPainter:
                     self.pending = ""
                     if not self.process_events(events):
                         return
+                next_frame = time.monotonic()
                 while True:
-                    ready, _, _ = select.select([fd], [], [], 0.05)
+                    timeout = None
+                    if self.buffer.dirty is not None:
+                        timeout = max(0.0, next_frame - time.monotonic())
+                    ready, _, _ = select.select([fd], [], [], timeout)
                     if fd in ready:
                         chunk = os.read(fd, 1024)
                         if not chunk:
@@ -248,32 +344,34 @@ class KittyPainter:
                         events = parser.feed(chunk.decode("ascii", errors="ignore"))
                         if not self.process_events(events):
                             return
+                    now = time.monotonic()
+                    if self.buffer.dirty is not None and now >= next_frame:
+                        self.render_canvas()
+                        next_frame = now + FRAME_INTERVAL
             finally:
                 disable_mouse()
-                for image_id in self.image_ids:
-                    kitty_delete(image_id, delete_data=True)
+                kitty_delete(self.image_id, delete_data=True)
                 show_cursor()
 
     def query_dimensions(self, fd: int) -> None:
-        rows, cols = self.request_csi(fd, "\x1b[18t", r"\x1b\[8;(\d+);(\d+)t", default=(24, 80))
+        rows, cols = self.request_csi(fd, "\x1b[18t", WINDOW_CELLS_RE, default=(24, 80))
         self.rows = rows
         self.cols = cols
         self.canvas_rows = max(self.rows - self.status_rows, 1)
-        _ = self.request_csi(fd, "\x1b[14t", r"\x1b\[4;(\d+);(\d+)t", default=None)
+        _ = self.request_csi(fd, "\x1b[14t", WINDOW_PIXELS_RE, default=None)
 
     def request_csi(
         self,
         fd: int,
         request: str,
-        pattern: str,
+        pattern: "re.Pattern[str]",
         default: Optional[Tuple[int, int]] = None,
         timeout: float = 0.5,
     ) -> Tuple[int, int]:
-        sys.stdout.write(request)
+        sys.stdout.buffer.write(request.encode("ascii"))
         sys.stdout.flush()
         deadline = time.time() + timeout
         buf = ""
-        compiled = re.compile(pattern)
         while time.time() < deadline:
             ready, _, _ = select.select([fd], [], [], 0.05)
             if not ready:
@@ -282,7 +380,7 @@ class KittyPainter:
             if not chunk:
                 break
             buf += chunk.decode("ascii", errors="ignore")
-            match = compiled.search(buf)
+            match = pattern.search(buf)
             if match:
                 end = match.end()
                 tail = buf[end:]
@@ -296,26 +394,43 @@ class KittyPainter:
         return default
 
     def render_canvas(self) -> None:
-        next_index = (self.active_image_index + 1) % len(self.image_ids)
-        image_id = self.image_ids[next_index]
+        dirty = self.buffer.take_dirty()
+        if not self.image_placed:
+            self.upload_canvas()
+        elif dirty is not None:
+            self.upload_region(*dirty)
+        self.render_status_line()
+        self.flush_output()
+
+    def upload_canvas(self) -> None:
         control = (
             "a=T,"
             f"f=32,"
             f"s={self.buffer.width},"
             f"v={self.buffer.height},"
-            f"i={image_id},"
+            f"i={self.image_id},"
             "q=2,"
             f"c={self.cols},"
             f"r={self.canvas_rows},"
             f"p={self.placement_id},"
             "C=1"
         )
-        kitty_send(bytes(self.buffer.data), control)
-        if self.active_image_index != -1:
-            old_image_id = self.image_ids[self.active_image_index]
-            kitty_delete(old_image_id, placement_id=self.placement_id, delete_data=True)
-        self.active_image_index = next_index
-        self.render_status_line()
+        kitty_send(self.buffer.view, control, self._out)
+        self.image_placed = True
+
+    def upload_region(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        control = (
+            "a=f,"
+            "r=1,"
+            "f=32,"
+            f"x={x0},"
+            f"y={y0},"
+            f"s={x1 - x0},"
+            f"v={y1 - y0},"
+            f"i={self.image_id},"
+            "q=2"
+        )
+        kitty_send(self.buffer.region(x0, y0, x1, y1), control, self._out)
 
     def render_status_line(self) -> None:
         if self.cols <= 0 or self.rows <= 0:
@@ -338,11 +453,16 @@ class KittyPainter:
             line = f"{line}  | {message}"
         trimmed = line[: self.cols]
         padded = trimmed.ljust(self.cols)
-        sys.stdout.write(f"{ESC}[{row};1H{padded}{ESC}[H")
-        sys.stdout.flush()
+        self._out.extend(f"{ESC}[{row};1H{padded}{ESC}[H".encode())
         if message:
             self.status_message = ""
 
+    def flush_output(self) -> None:
+        if self._out:
+            sys.stdout.buffer.write(self._out)
+            sys.stdout.flush()
+            self._out.clear()
+
     def cycle_color(self, step: int) -> None:
         if not self.palette:
             return
@@ -352,6 +472,7 @@ class KittyPainter:
         name = self.palette[self.color_index][0]
         self.status_message = f"Color -> {name}"
         self.render_status_line()
+        self.flush_output()
 
     def change_brush_radius(self, delta: int) -> None:
         min_radius = 1
@@ -366,12 +487,12 @@ class KittyPainter:
             elif delta > 0:
                 self.status_message = "Radius at maximum"
         self.render_status_line()
+        self.flush_output()
 
     def clear_canvas(self) -> None:
         self.buffer.clear()
         self.prev_point = None
         self.status_message = "Canvas cleared"
-        self.render_canvas()
 
     def process_events(self, events: List[Tuple[str, Tuple]]) -> bool:
         for kind, payload in events:
@@ -417,7 +538,6 @@ class KittyPainter:
         else:
             self.buffer.paint_disc(px, py, self.config.brush_radius, self.config.brush_color)
         self.prev_point = (px, py)
-        self.render_canvas()
 
     def cell_to_canvas(self, col: int, row: int) -> Tuple[int, int]:
         fx = (col - 0.5) / max(self.cols, 1)